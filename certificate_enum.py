@@ -1,101 +1,231 @@
-import requests
-import json
+import orjson
+import os
+import time
 import argparse
 from datetime import datetime
+import socket
+import aiodns
 import httpx
+import ijson
+from aiolimiter import AsyncLimiter
 import asyncio
+try:
+    import uvloop  # Faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
+MAX_CONCURRENT_HOSTS = 50
+MAX_CONCURRENT_DOMAINS = 5
+MAX_CONCURRENT_LOOKUPS = 200
+HTTPS_PORTS = {443, 8443}  # Probed over TLS without certificate verification
+CACHE_DIR = '.ctcache'
+CACHE_TTL = 3600  # seconds
+SOURCE_URLS = {
+    "crtsh": "https://crt.sh/?q=%25.{domain}&output=json",
+    "certspotter": "https://api.certspotter.com/v1/issuances?domain={domain}&include_subdomains=true&expand=dns_names",
+}
+RATE_LIMITS = {"crtsh": 60, "certspotter": 20}  # requests per minute
+
+# Leaky-bucket limiters so a --domain-file run can't burst past a service's limit
+SOURCE_LIMITERS = {source: AsyncLimiter(rpm, 60) for source, rpm in RATE_LIMITS.items()}
+
+def load_cached_subdomains(source, domain):
+    path = os.path.join(CACHE_DIR, f"{source}_{domain}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            return set(orjson.loads(f.read()))
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+def save_cached_subdomains(source, domain, subdomains):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, f"{source}_{domain}.json"), 'wb') as f:
+        f.write(orjson.dumps(list(subdomains)))
+
+async def get_subdomains_crtsh(client, domain, use_cache=True):
+    if use_cache:
+        cached = load_cached_subdomains('crtsh', domain)
+        if cached is not None:
+            print(f"Loaded {len(cached)} subdomains from crt.sh cache.")
+            return cached
 
-def get_subdomains_crtsh(domain):
     print("Fetching data from crt.sh...")
-    url = f"https://crt.sh/?q=%25.{domain}&output=json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        print(f"Error fetching data from crt.sh: {response.status_code}")
-        return []
+    url = SOURCE_URLS["crtsh"].format(domain=domain)
 
     subdomains = set()
-    try:
-        certs = json.loads(response.text)
-        for cert in certs:
-            name_value = cert.get('name_value')
-            if name_value:
-                subdomains.update(name_value.split('\n'))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON response: {e}")
-        return []
+    await SOURCE_LIMITERS["crtsh"].acquire()
+    async with client.stream("GET", url) as response:
+        if response.status_code != 200:
+            print(f"Error fetching data from crt.sh: {response.status_code}")
+            return set()
+
+        # Parse certificates as they arrive instead of buffering the whole response
+        name_values = ijson.sendable_list()
+        parser = ijson.items_coro(name_values, 'item.name_value')
+        try:
+            async for chunk in response.aiter_bytes():
+                parser.send(chunk)
+                for name_value in name_values:
+                    if name_value:
+                        # Wildcard entries are dropped here so they never enter the set
+                        subdomains.update(name for name in name_value.split('\n') if name and '*' not in name)
+                del name_values[:]
+            parser.close()
+        except ijson.JSONError as e:
+            print(f"Error parsing JSON response: {e}")
+            return set()
 
     print(f"Found {len(subdomains)} subdomains from crt.sh.")
+    if use_cache:
+        save_cached_subdomains('crtsh', domain, subdomains)
     return subdomains
 
-def get_subdomains_certspotter(domain):
+async def get_subdomains_certspotter(client, domain):
     print("Fetching data from CertSpotter...")
-    url = f"https://api.certspotter.com/v1/issuances?domain={domain}&include_subdomains=true&expand=dns_names"
-    response = requests.get(url)
+    url = SOURCE_URLS["certspotter"].format(domain=domain)
+    async with SOURCE_LIMITERS["certspotter"]:
+        response = await client.get(url)
     
     if response.status_code != 200:
         print(f"Error fetching data from CertSpotter: {response.status_code}")
-        return []
+        return set()
 
     subdomains = set()
     try:
-        certs = json.loads(response.text)
+        certs = orjson.loads(response.content)
         for cert in certs:
             dns_names = cert.get('dns_names', [])
-            subdomains.update(dns_names)
-    except json.JSONDecodeError as e:
+            subdomains.update(name for name in dns_names if name and '*' not in name)
+    except orjson.JSONDecodeError as e:
         print(f"Error parsing JSON response: {e}")
-        return []
+        return set()
 
     print(f"Found {len(subdomains)} subdomains from CertSpotter.")
     return subdomains
 
-def combine_and_clean_subdomains(crtsh_subdomains, certspotter_subdomains):
-    combined_subdomains = crtsh_subdomains.union(certspotter_subdomains)
-    
-    # Remove wildcard domains and duplicates
-    cleaned_subdomains = {sub for sub in combined_subdomains if '*' not in sub}
-    
-    return cleaned_subdomains
-
-def save_to_file(filename, crtsh_subdomains, certspotter_subdomains):
+def save_to_file(filename, crtsh_subdomains, certspotter_subdomains, sort=False):
+    # Sorting large sets is costly and only matters when the file is read by a human
+    if sort:
+        # The sources mostly overlap, so sort their union once and pick each source's names out of it in order
+        all_sorted = sorted(crtsh_subdomains | certspotter_subdomains)
+        crtsh_list = [name for name in all_sorted if name in crtsh_subdomains]
+        certspotter_list = [name for name in all_sorted if name in certspotter_subdomains]
+    else:
+        crtsh_list = list(crtsh_subdomains)
+        certspotter_list = list(certspotter_subdomains)
     data = {
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "subdomains": {
-            "crtsh": sorted(crtsh_subdomains),
-            "certspotter": sorted(certspotter_subdomains)
+            "crtsh": crtsh_list,
+            "certspotter": certspotter_list
         }
     }
     
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
-async def check_liveliness(subdomain, ports, rate_limit, proxy, user_agent):
+def port_url(subdomain, port):
+    scheme = "https" if port in HTTPS_PORTS else "http"
+    return f"{scheme}://{subdomain}:{port}"
+
+async def resolve_subdomains(resolver, subdomains):
+    if resolver is None:
+        return set(subdomains), {}
+    # Bounded like the probes so a large crt.sh set doesn't flood the resolver into timeouts
+    lookup_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LOOKUPS)
+
+    async def resolve(subdomain):
+        async with lookup_semaphore:
+            return await resolver.getaddrinfo(subdomain, family=socket.AF_UNSPEC)
+
+    subdomains = list(subdomains)
+    answers = await asyncio.gather(*[resolve(subdomain) for subdomain in subdomains], return_exceptions=True)
+    resolved = {subdomain for subdomain, answer in zip(subdomains, answers) if not isinstance(answer, Exception)}
+    # Unresolved names are kept with their error so --debug output can still list them
+    unresolved = {subdomain: answer for subdomain, answer in zip(subdomains, answers) if isinstance(answer, Exception)}
+    print(f"{len(resolved)} of {len(subdomains)} subdomains resolved")
+    return resolved, unresolved
+
+async def check_liveliness(client, subdomain, ports, limiter, debug=False):
     results = []
-    async with httpx.AsyncClient( headers={"User-Agent": user_agent}) as client:
-        for port in ports:
-            url = f"http://{subdomain}:{port}"
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    results.append({"url": url, "status": "live", "status_code": response.status_code})
-                    print(f"{url} is live with status code {response.status_code}")
-                else:
-                    results.append({"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code})
-                    print(f"{url} returned status code {response.status_code}")
-            except httpx.RequestError as exc:
-                results.append({"url": url, "status": f"could not be reached: {exc}", "status_code": None})
-                print(f"{url} could not be reached: {exc}")
-            await asyncio.sleep(1 / rate_limit)
+    for port in ports:
+        url = port_url(subdomain, port)
+        try:
+            # Only the status code matters, so skip downloading the body
+            async with limiter:
+                response = await client.head(url, follow_redirects=True)
+            if response.status_code == 405:
+                # Server doesn't allow HEAD; fall back to a GET for a single byte
+                async with limiter:
+                    response = await client.get(url, headers={"Range": "bytes=0-0"}, follow_redirects=True)
+            if response.status_code in (200, 206):
+                results.append({"url": url, "status": "live", "status_code": response.status_code})
+                print(f"{url} is live with status code {response.status_code}")
+            else:
+                results.append({"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code})
+                print(f"{url} returned status code {response.status_code}")
+        except httpx.RequestError as exc:
+            results.append({"url": url, "status": f"could not be reached: {exc}", "status_code": None})
+            print(f"{url} could not be reached: {exc}")
+            continue
+        # One live port is enough to call the host live; debug runs still probe every port
+        if response.status_code in (200, 206) and not debug:
+            break
     return results
 
+async def bounded_check_liveliness(semaphore, client, subdomain, ports, limiter, debug=False):
+    async with semaphore:
+        return await check_liveliness(client, subdomain, ports, limiter, debug)
+
+async def enumerate_domain(client, live_client, resolver, semaphore, limiter, probe_cache, domain, args):
+    print(f"\n=== Enumerating subdomains for {domain} ===")
+    subdomains_crtsh, subdomains_certspotter = await asyncio.gather(
+        get_subdomains_crtsh(client, domain, use_cache=not args.no_cache),
+        get_subdomains_certspotter(client, domain))
+
+    if subdomains_crtsh or subdomains_certspotter:
+        filename = f'{domain}_all_subdomains.json'
+        save_to_file(filename, subdomains_crtsh, subdomains_certspotter, sort=args.sort)
+        print(f"Subdomains saved to {filename}")
+
+        resolved_subdomains, unresolved_subdomains = await resolve_subdomains(resolver, subdomains_crtsh | subdomains_certspotter)
+
+        # Hosts shared with another domain in the same run are only probed once
+        for subdomain in resolved_subdomains - probe_cache.keys():
+            probe_cache[subdomain] = asyncio.ensure_future(
+                bounded_check_liveliness(semaphore, live_client, subdomain, args.ports, limiter, args.debug))
+
+        # Write each host's results as soon as its probe finishes instead of collecting them all first
+        result_filename = f'{domain}_liveliness_check_results.json'
+        with open(result_filename, 'wb') as f:
+            f.write(b'[')
+            separator = b'\n'
+            if args.debug:
+                for subdomain, exc in unresolved_subdomains.items():
+                    for port in args.ports:
+                        result = {"url": port_url(subdomain, port), "status": f"could not be reached: {exc}", "status_code": None}
+                        f.write(separator + orjson.dumps(result))
+                        separator = b',\n'
+            for probe in asyncio.as_completed([probe_cache[subdomain] for subdomain in resolved_subdomains]):
+                for result in await probe:
+                    if args.debug or result['status'] == 'live':
+                        f.write(separator + orjson.dumps(result))
+                        separator = b',\n'
+            f.write(b'\n]\n')
+        print(f"Liveliness results saved to {result_filename}")
+    else:
+        print(f"No subdomains found for {domain}.")
+
 async def main():
     parser = argparse.ArgumentParser(description="Enumerate subdomains using crt.sh and CertSpotter")
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-d', '--domain', help='Domain to enumerate subdomains for')
     group.add_argument('-D', '--domain-file', help='File with list of domains to enumerate')
-    parser.add_argument('--ports', nargs='+', type=int, default=[8443, 443, 80], 
-                        help='Ports to check for liveliness (default: 8443, 443, 80)')
+    parser.add_argument('--ports', nargs='+', type=int, default=[443, 8443, 80], 
+                        help='Ports to check for liveliness, in order; stops at the first live port '
+                             'unless --debug (default: 443, 8443, 80)')
     parser.add_argument('--rate-limit', type=float, default=3.0, 
                         help='Rate limit for liveliness checks (requests per second, default: 3)')
     parser.add_argument('--proxy', type=str, default=None, 
@@ -104,42 +234,45 @@ async def main():
                         default="Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/113.0", 
                         help='User-Agent to use for liveliness checks (default: Mozilla/5.0...)')
     parser.add_argument('--debug', action='store_true', help='Save all results including unreachable hosts')
+    parser.add_argument('--sort', action='store_true', help='Sort the subdomains written to <domain>_all_subdomains.json')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Always re-download crt.sh results instead of reusing the {CACHE_DIR} cache')
 
     args = parser.parse_args()
 
     if args.domain_file:
         with open(args.domain_file, 'r') as f:
-            domains = [line.strip() for line in f if line.strip()]
+            # Domains run concurrently and each writes files named after itself, so a repeat must run only once
+            domains = list(dict.fromkeys(line.strip() for line in f if line.strip()))
     else:
         domains = [args.domain]
 
-    for domain in domains:
-        print(f"\n=== Enumerating subdomains for {domain} ===")
-        subdomains_crtsh = get_subdomains_crtsh(domain)
-        subdomains_certspotter = get_subdomains_certspotter(domain)
-
-        if subdomains_crtsh or subdomains_certspotter:
-            filename = f'{domain}_all_subdomains.json'
-            save_to_file(filename, subdomains_crtsh, subdomains_certspotter)
-            print(f"Subdomains saved to {filename}")
+    # Behind --proxy the upstream resolves names (possibly ones local DNS can't see), so don't pre-resolve locally
+    resolver = None if args.proxy else aiodns.DNSResolver()
+    limiter = AsyncLimiter(1, 1 / args.rate_limit)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_HOSTS)
+    # Discovery traffic goes to a handful of CT-log hosts, so keep those HTTP/2 sessions warm between domains
+    source_limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    async with httpx.AsyncClient(http2=True, timeout=30, limits=source_limits,
+                                 headers={"User-Agent": args.user_agent}) as client, \
+               httpx.AsyncClient(http2=True, timeout=10, limits=limits, proxy=args.proxy, verify=False,
+                                 headers={"User-Agent": args.user_agent}) as live_client:
+        domain_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOMAINS)
+        probe_cache = {}
 
-            combined_cleaned_subdomains = combine_and_clean_subdomains(subdomains_crtsh, subdomains_certspotter)
+        async def bounded_enumerate_domain(domain):
+            async with domain_semaphore:
+                await enumerate_domain(client, live_client, resolver, semaphore, limiter, probe_cache, domain, args)
 
-            tasks = [check_liveliness(subdomain, args.ports, args.rate_limit, args.proxy, args.user_agent)
-                     for subdomain in combined_cleaned_subdomains]
-            results = await asyncio.gather(*tasks)
-
-            flat_results = [item for sublist in results for item in sublist]
-
-            if not args.debug:
-                flat_results = [result for result in flat_results if result['status'] == 'live']
-
-            result_filename = f'{domain}_liveliness_check_results.json'
-            with open(result_filename, 'w') as f:
-                json.dump(flat_results, f, indent=4)
-            print(f"Liveliness results saved to {result_filename}")
-        else:
-            print(f"No subdomains found for {domain}.")
+        results = await asyncio.gather(*[bounded_enumerate_domain(domain) for domain in domains],
+                                       return_exceptions=True)
+        for domain, result in zip(domains, results):
+            if isinstance(result, Exception):
+                print(f"Error enumerating {domain}: {result!r}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
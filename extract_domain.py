@@ -1,21 +1,18 @@
 import tldextract
 
+# Single extractor using the bundled public suffix list snapshot (no network fetch)
+extractor = tldextract.TLDExtract(suffix_list_urls=())
+
 def extract_domains(input_file, output_file):
     with open(input_file, 'r') as file:
-        subdomains = file.readlines()
-    
-    domains = set()
-    for subdomain in subdomains:
-        subdomain = subdomain.strip()
-        extracted = tldextract.extract(subdomain)
-        domain = f"{extracted.domain}.{extracted.suffix}"
-        domains.add(domain)
+        domains = {f"{extracted.domain}.{extracted.suffix}"
+                   for line in file
+                   if (extracted := extractor(line.strip())).suffix}
     
     with open(output_file, 'w') as file:
-        for domain in sorted(domains):
-            file.write(domain + '\n')
+        file.write("".join(f"{domain}\n" for domain in sorted(domains)))
 
 if __name__ == "__main__":
     input_file = 'subdomains.txt'  # Replace with your input file name
     output_file = 'domains.txt'    # Replace with your desired output file name
-    extract_domains(input_file, output_file)
\ No newline at end of file
+    extract_domains(input_file, output_file)
@@ -1,9 +1,23 @@
 import sys
-import json
+import orjson
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import googlesearch
 from googlesearch import search
 from tqdm import tqdm
 
+# googlesearch calls requests.get for every result page; route it through one
+# pooled session so all queries share keep-alive connections to Google
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_maxsize=10))
+googlesearch.get = SESSION.get
+
 def google_search(query, num_results=10):
+    # Stagger concurrent queries so they don't hit Google's rate limiter at once
+    time.sleep(random.uniform(0, 2))
     results = []
     for result in search(query, num_results=num_results):
         results.append(result)
@@ -28,17 +42,19 @@ if __name__ == "__main__":
         f'site:*<{target} intext:"login" | intitle:"login" | inurl:"login" | intext:"username" | intitle:"username" | inurl:"username" | intext:"password" | intitle:"password" | inurl:"password"'
     ]
 
-    all_results = {}
-    for query in tqdm(queries, desc="Processing queries"):
-        results = google_search(query)
-        if not results:
-            all_results[query] = "No results found"
-        else:
-            all_results[query] = results
+    all_results = dict.fromkeys(queries)  # Keep the output in query order
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = {executor.submit(google_search, query): query for query in queries}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing queries"):
+            results = future.result()
+            if not results:
+                all_results[futures[future]] = "No results found"
+            else:
+                all_results[futures[future]] = results
 
     if args.export:
-        with open(args.filename, 'w') as f:
-            json.dump(all_results, f, indent=4)
+        with open(args.filename, 'wb') as f:
+            f.write(orjson.dumps(all_results, option=orjson.OPT_INDENT_2))
         print(f"\nResults exported to {args.filename}")
     else:
-        print(json.dumps(all_results, indent=4))
+        print(orjson.dumps(all_results, option=orjson.OPT_INDENT_2).decode())
@@ -1,18 +1,31 @@
 import requests
 import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared session so repeated fetches reuse pooled connections and TLS sessions
+retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                respect_retry_after_header=True)
+adapter = HTTPAdapter(pool_connections=20, pool_maxsize=100, max_retries=retries)
+SESSION = requests.Session()
+SESSION.mount('https://', adapter)
+SESSION.mount('http://', adapter)
+
+# Compiled once and matched against the raw body to skip decoding the whole file
+# Adjust the regex pattern based on the expected format of the API URLs
+_URL_RE = re.compile(rb'https?://[^\s)"]+')  # Matches URLs
 
 def scrape_api_endpoints(js_url):
     try:
         # Fetch the JavaScript file
-        response = requests.get(js_url)
+        response = SESSION.get(js_url)
         response.raise_for_status()  # Raise an error for bad responses
 
         # Use regex to find API endpoints (this is a basic example)
-        # Adjust the regex pattern based on the expected format of the API URLs
-        api_pattern = r'https?://[^\s)"]+'  # Matches URLs
-        api_endpoints = re.findall(api_pattern, response.text)
+        # Deduplicate on the raw bytes so each URL is only decoded once
+        api_endpoints = dict.fromkeys(match.group(0) for match in _URL_RE.finditer(response.content))
 
-        return api_endpoints
+        return [endpoint.decode('utf-8', 'replace') for endpoint in api_endpoints]
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching the JavaScript file: {e}")
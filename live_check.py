@@ -1,30 +1,67 @@
 import argparse
 import asyncio
+try:
+    import uvloop  # Faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+import socket
+import aiodns
 import httpx
-import json
+from aiolimiter import AsyncLimiter
+import orjson
 import logging
 
+MAX_CONCURRENT_PROBES = 200
+MAX_CONCURRENT_LOOKUPS = 200
+HTTPS_PORTS = {443, 8443}  # Probed over TLS without certificate verification
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-async def check_liveliness(endpoint, ports, rate_limit, proxy, user_agent):
-    results = []
-    async with httpx.AsyncClient(proxies=proxy, headers={"User-Agent": user_agent}) as client:
-        for port in ports:
-            url = f"http://{endpoint}:{port}"
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    results.append({"url": url, "status": "live", "status_code": response.status_code})
-                    logging.info(f"{url} is live with status code {response.status_code}")
-                else:
-                    results.append({"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code})
-                    logging.warning(f"{url} returned status code {response.status_code}")
-            except httpx.RequestError as exc:
-                results.append({"url": url, "status": f"could not be reached: {exc}", "status_code": None})
-                logging.error(f"{url} could not be reached: {exc}")
-            await asyncio.sleep(1 / rate_limit)
-    return results
+def port_url(endpoint, port):
+    scheme = "https" if port in HTTPS_PORTS else "http"
+    return f"{scheme}://{endpoint}:{port}"
+
+async def resolve_endpoints(resolver, endpoints):
+    if resolver is None:
+        return set(endpoints), {}
+    # Bounded like the probes so a large endpoint list doesn't flood the resolver into timeouts
+    lookup_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LOOKUPS)
+
+    async def resolve(endpoint):
+        async with lookup_semaphore:
+            return await resolver.getaddrinfo(endpoint, family=socket.AF_UNSPEC)
+
+    endpoints = list(endpoints)
+    answers = await asyncio.gather(*[resolve(endpoint) for endpoint in endpoints], return_exceptions=True)
+    resolved = {endpoint for endpoint, answer in zip(endpoints, answers) if not isinstance(answer, Exception)}
+    # Unresolved names are kept with their error so --debug output can still list them
+    unresolved = {endpoint: answer for endpoint, answer in zip(endpoints, answers) if isinstance(answer, Exception)}
+    logging.info(f"{len(resolved)} of {len(endpoints)} endpoints resolved")
+    return resolved, unresolved
+
+async def check_liveliness(client, endpoint, port, limiter):
+    url = port_url(endpoint, port)
+    try:
+        # Only the status code matters, so skip downloading the body
+        async with limiter:
+            response = await client.head(url, follow_redirects=True)
+        if response.status_code == 405:
+            # Server doesn't allow HEAD; fall back to a GET for a single byte
+            async with limiter:
+                response = await client.get(url, headers={"Range": "bytes=0-0"}, follow_redirects=True)
+        if response.status_code in (200, 206):
+            logging.info(f"{url} is live with status code {response.status_code}")
+            return {"url": url, "status": "live", "status_code": response.status_code}
+        logging.warning(f"{url} returned status code {response.status_code}")
+        return {"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code}
+    except httpx.RequestError as exc:
+        logging.error(f"{url} could not be reached: {exc}")
+        return {"url": url, "status": f"could not be reached: {exc}", "status_code": None}
+
+async def bounded_check_liveliness(semaphore, client, endpoint, port, limiter):
+    async with semaphore:
+        return await check_liveliness(client, endpoint, port, limiter)
 
 async def main():
     parser = argparse.ArgumentParser(description="Perform liveliness check on endpoints from a file")
@@ -47,22 +84,36 @@ async def main():
     with open(args.file, 'r') as f:
         endpoints = {line.strip() for line in f if line.strip()}
 
-    tasks = [check_liveliness(endpoint, args.ports, args.rate_limit, args.proxy, args.user_agent) for endpoint in endpoints]
-    
-    results = await asyncio.gather(*tasks)
-    
-    # Flatten the list of results
-    flat_results = [item for sublist in results for item in sublist]
+    # Behind --proxy the upstream resolves names (possibly ones local DNS can't see), so don't pre-resolve locally
+    resolver = None if args.proxy else aiodns.DNSResolver()
+    endpoints, unresolved_endpoints = await resolve_endpoints(resolver, endpoints)
+
+    limiter = AsyncLimiter(1, 1 / args.rate_limit)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    async with httpx.AsyncClient(http2=True, timeout=10, limits=limits, proxy=args.proxy, verify=False,
+                                 headers={"User-Agent": args.user_agent}) as client:
+        # Every (endpoint, port) pair is an independent probe
+        tasks = [bounded_check_liveliness(semaphore, client, endpoint, port, limiter)
+                 for endpoint in endpoints for port in args.ports]
+        
+        flat_results = await asyncio.gather(*tasks)
+
+    flat_results += [{"url": port_url(endpoint, port), "status": f"could not be reached: {exc}", "status_code": None}
+                     for endpoint, exc in unresolved_endpoints.items() for port in args.ports]
     
     # Filter out unreachable hosts unless --debug is specified
     if not args.debug:
         flat_results = [result for result in flat_results if 'could not be reached' not in result['status']]
     
     # Save the liveliness check results to a JSON file
-    with open('liveliness_check_results.json', 'w') as f:
-        json.dump(flat_results, f, indent=4)
+    with open('liveliness_check_results.json', 'wb') as f:
+        f.write(orjson.dumps(flat_results, option=orjson.OPT_INDENT_2))
     
     logging.info("Liveliness check results have been saved to liveliness_check_results.json")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
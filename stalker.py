@@ -1,102 +1,184 @@
-import requests
-import json
+import orjson
+import os
 import argparse
 from datetime import datetime
+import socket
+import aiodns
 import httpx
+import ijson
+from aiolimiter import AsyncLimiter
 import asyncio
+import re
+try:
+    import uvloop  # Faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+MAX_CONCURRENT_HOSTS = 128
+HTTPS_PORTS = {443, 8443}  # Probed over TLS without certificate verification
+STATE_DIR = '.ctcache'  # Per-domain pagination cursors and the subdomains collected so far
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def get_subdomains_crtsh(domain):
-    logging.info("Fetching data from crt.sh...")
-    url = f"https://crt.sh/?q=%25.{domain}&output=json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        logging.error(f"Error fetching data from crt.sh: {response.status_code}")
-        return []
+# One hostname per line; wildcard, empty and whitespace-containing entries never match, so they are
+# dropped as the names are extracted. Anything else is kept, including IDN TLDs and trailing dots.
+HOST_RE = re.compile(r"^[^\s*]+$", re.MULTILINE)
 
-    subdomains = set()
+# Each source streams a JSON array of certificates; "path" is the ijson prefix of the
+# field holding the names and "extract" turns that field into individual hostnames.
+# Sources with a "cursor" are paged with ?after=<cursor of the last item seen>.
+SOURCES = (
+    {"name": "crt.sh", "url": "https://crt.sh/?q=%25.{domain}&output=json",
+     "path": "item.name_value", "extract": lambda name_value: HOST_RE.findall(name_value)},
+    {"name": "CertSpotter",
+     "url": "https://api.certspotter.com/v1/issuances?domain={domain}&include_subdomains=true&expand=dns_names",
+     "path": "item", "cursor": "id",
+     "extract": lambda cert: [name for name in cert.get('dns_names') or () if HOST_RE.fullmatch(name)]},
+)
+
+def state_path(source, domain):
+    return os.path.join(STATE_DIR, f"{source['name'].lower()}_{domain}_state.json")
+
+def load_source_state(source, domain):
     try:
-        certs = json.loads(response.text)
-        for cert in certs:
-            name_value = cert.get('name_value')
-            if name_value:
-                subdomains.update(name_value.split('\n'))
-    except json.JSONDecodeError as e:
-        logging.error(f"Error parsing JSON response: {e}")
-        return []
-
-    logging.info(f"Found {len(subdomains)} subdomains from crt.sh.")
-    return subdomains
+        with open(state_path(source, domain), 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def get_subdomains_certspotter(domain):
-    logging.info("Fetching data from CertSpotter...")
-    url = f"https://api.certspotter.com/v1/issuances?domain={domain}&include_subdomains=true&expand=dns_names"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        logging.error(f"Error fetching data from CertSpotter: {response.status_code}")
-        return []
+def save_source_state(source, domain, after, subdomains):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(state_path(source, domain), 'wb') as f:
+        f.write(orjson.dumps({"after": after, "subdomains": list(subdomains)}))
 
+# Only connection failures and 5xx responses can succeed on a second try; 4xx and bad JSON fail fast
+@retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=1, max=10),
+       retry=retry_if_exception_type((httpx.TransportError, httpx.HTTPStatusError)), reraise=True)
+async def fetch_page(client, source, url):
+    # Returns (subdomains, last item) for the page, or None if the request failed
     subdomains = set()
-    try:
-        certs = json.loads(response.text)
-        for cert in certs:
-            dns_names = cert.get('dns_names', [])
-            subdomains.update(dns_names)
-    except json.JSONDecodeError as e:
-        logging.error(f"Error parsing JSON response: {e}")
-        return []
-
-    logging.info(f"Found {len(subdomains)} subdomains from CertSpotter.")
-    return subdomains
+    last = None
+    async with client.stream("GET", url) as response:
+        if response.status_code >= 500:
+            response.raise_for_status()
+        if response.status_code != 200:
+            logging.error(f"Error fetching data from {source['name']}: {response.status_code}")
+            return None
 
-def combine_and_clean_subdomains(crtsh_subdomains, certspotter_subdomains):
-    logging.info("Combining and cleaning subdomains...")
-    combined_subdomains = crtsh_subdomains.union(certspotter_subdomains)
-    
-    # Remove wildcard domains and duplicates
-    cleaned_subdomains = {sub for sub in combined_subdomains if '*' not in sub}
-    
-    logging.info(f"Total unique subdomains after cleaning: {len(cleaned_subdomains)}")
-    return cleaned_subdomains
+        # Parse certificates as they arrive instead of buffering the whole response
+        values = ijson.sendable_list()
+        parser = ijson.items_coro(values, source["path"])
+        try:
+            async for chunk in response.aiter_bytes():
+                parser.send(chunk)
+                for value in values:
+                    if value:
+                        subdomains.update(source["extract"](value))
+                    last = value
+                del values[:]
+            parser.close()
+        except ijson.JSONError as e:
+            logging.error(f"Error parsing JSON response: {e}")
+            return None
+
+    return subdomains, last
+
+async def fetch_source(client, source, domain, use_cache=True):
+    logging.info(f"Fetching data from {source['name']}...")
+    url = source["url"].format(domain=domain)
+
+    if "cursor" not in source:
+        try:
+            page = await fetch_page(client, source, url)
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            # Retries are exhausted; a flaky source shouldn't take the whole run down with it
+            logging.error(f"Error fetching data from {source['name']}: {e}")
+            page = None
+        subdomains = page[0] if page else set()
+    else:
+        # Resume after the last item seen on a previous run so only new pages are downloaded
+        state = load_source_state(source, domain) if use_cache else {}
+        after = state.get("after")
+        subdomains = set(state.get("subdomains", ()))
+        while True:
+            try:
+                page = await fetch_page(client, source, f"{url}&after={after}" if after else url)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                # Keep the pages already collected; the next run resumes from the last good one
+                logging.error(f"Error fetching data from {source['name']}: {e}")
+                break
+            if not page or page[1] is None:
+                break
+            page_subdomains, last = page
+            subdomains.update(page_subdomains)
+            after = last[source["cursor"]]
+        save_source_state(source, domain, after, subdomains)
 
-def save_to_file(filename, crtsh_subdomains, certspotter_subdomains):
+    logging.info(f"Found {len(subdomains)} subdomains from {source['name']}.")
+    return subdomains
+
+def save_to_file(filename, crtsh_subdomains, certspotter_subdomains, sort=False):
+    # Sorting large sets is costly and only matters when the file is read by a human
+    if sort:
+        # The sources mostly overlap, so sort their union once and pick each source's names out of it in order
+        all_sorted = sorted(crtsh_subdomains | certspotter_subdomains)
+        crtsh_list = [name for name in all_sorted if name in crtsh_subdomains]
+        certspotter_list = [name for name in all_sorted if name in certspotter_subdomains]
+    else:
+        crtsh_list = list(crtsh_subdomains)
+        certspotter_list = list(certspotter_subdomains)
     data = {
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "subdomains": {
-            "crtsh": sorted(crtsh_subdomains),
-            "certspotter": sorted(certspotter_subdomains)
+            "crtsh": crtsh_list,
+            "certspotter": certspotter_list
         }
     }
     
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
-
-async def check_liveliness(subdomain, ports, rate_limit, proxy, user_agent):
-    results = []
-    async with httpx.AsyncClient(proxies=proxy, headers={"User-Agent": user_agent}) as client:
-        for port in ports:
-            url = f"http://{subdomain}:{port}"
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    results.append({"url": url, "status": "live", "status_code": response.status_code})
-                    logging.info(f"{url} is live with status code {response.status_code}")
-                else:
-                    results.append({"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code})
-                    logging.warning(f"{url} returned status code {response.status_code}")
-            except httpx.RequestError as exc:
-                results.append({"url": url, "status": f"could not be reached: {exc}", "status_code": None})
-                logging.error(f"{url} could not be reached: {exc}")
-            await asyncio.sleep(1 / rate_limit)
-    return results
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+def port_url(subdomain, port):
+    scheme = "https" if port in HTTPS_PORTS else "http"
+    return f"{scheme}://{subdomain}:{port}"
+
+async def check_port(client, subdomain, port, limiter):
+    url = port_url(subdomain, port)
+    try:
+        # Only the status code matters, so skip downloading the body
+        async with limiter:
+            response = await client.head(url, follow_redirects=True)
+        if response.status_code == 405:
+            # Server doesn't allow HEAD; fall back to a GET for a single byte
+            async with limiter:
+                response = await client.get(url, headers={"Range": "bytes=0-0"}, follow_redirects=True)
+        if response.status_code in (200, 206):
+            logging.info(f"{url} is live with status code {response.status_code}")
+            return {"url": url, "status": "live", "status_code": response.status_code}
+        logging.warning(f"{url} returned status code {response.status_code}")
+        return {"url": url, "status": f"status code {response.status_code}", "status_code": response.status_code}
+    except httpx.RequestError as exc:
+        logging.error(f"{url} could not be reached: {exc}")
+        return {"url": url, "status": f"could not be reached: {exc}", "status_code": None}
+
+async def check_liveliness(client, resolver, subdomain, ports, limiter):
+    # Resolve once up front; a dead name would otherwise cost a DNS timeout on every port
+    if resolver is not None:
+        try:
+            await resolver.getaddrinfo(subdomain, family=socket.AF_UNSPEC)
+        except aiodns.error.DNSError as exc:
+            logging.error(f"{subdomain} could not be resolved: {exc}")
+            return [{"url": port_url(subdomain, port), "status": f"could not be reached: {exc}", "status_code": None}
+                    for port in ports]
+    # Ports on the same host are independent, so probe them all at once
+    return await asyncio.gather(*(check_port(client, subdomain, port, limiter) for port in ports))
+
+async def bounded_check_liveliness(semaphore, client, resolver, subdomain, ports, limiter):
+    async with semaphore:
+        return await check_liveliness(client, resolver, subdomain, ports, limiter)
 
 async def main():
     parser = argparse.ArgumentParser(description="Enumerate subdomains using crt.sh and CertSpotter")
@@ -111,41 +193,56 @@ async def main():
                         default="Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/113.0", 
                         help='User-Agent to use for liveliness checks (default: Mozilla/5.0...)')
     parser.add_argument('--debug', action='store_true', help='Save all results including unreachable hosts')
+    parser.add_argument('--sort', action='store_true', help='Sort the subdomains written to all_subdomains.json')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Ignore the CertSpotter paging state saved in {STATE_DIR} and fetch every page again')
     
     args = parser.parse_args()
 
     logging.info("Starting subdomain enumeration...\n")
     
-    subdomains_crtsh = get_subdomains_crtsh(args.domain)
-    subdomains_certspotter = get_subdomains_certspotter(args.domain)
+    # CT-log JSON compresses well; with brotli installed httpx advertises and decodes br alongside gzip
+    async with httpx.AsyncClient(http2=True, timeout=30, headers={"User-Agent": args.user_agent}) as client:
+        source_subdomains = await asyncio.gather(
+            *(fetch_source(client, source, args.domain, use_cache=not args.no_cache) for source in SOURCES))
+    subdomains_crtsh, subdomains_certspotter = source_subdomains
 
     if subdomains_crtsh or subdomains_certspotter:
-        save_to_file('all_subdomains.json', subdomains_crtsh, subdomains_certspotter)
+        save_to_file('all_subdomains.json', subdomains_crtsh, subdomains_certspotter, sort=args.sort)
         logging.info(f"Subdomains found for {args.domain} have been saved to all_subdomains.json\n")
         
-        combined_cleaned_subdomains = combine_and_clean_subdomains(subdomains_crtsh, subdomains_certspotter)
+        # Wildcards were already dropped at ingestion, so combining is one union over every source
+        combined_subdomains = frozenset().union(*source_subdomains)
+        logging.info(f"Total unique subdomains: {len(combined_subdomains)}")
         
         logging.info("Starting liveliness checks...\n")
         
-        tasks = [check_liveliness(subdomain, args.ports, args.rate_limit, args.proxy, args.user_agent) for subdomain in combined_cleaned_subdomains]
-        
-        results = await asyncio.gather(*tasks)
-        
-        # Flatten the list of results
-        flat_results = [item for sublist in results for item in sublist]
-        
-        # Filter out unreachable hosts unless --debug is specified
-        if not args.debug:
-            flat_results = [result for result in flat_results if 'could not be reached' not in result['status']]
-        
-        # Save the liveliness check results to a separate JSON file
-        with open('liveliness_check_results.json', 'w') as f:
-            json.dump(flat_results, f, indent=4)
+        # Behind --proxy the upstream resolves names (possibly ones local DNS can't see), so don't pre-resolve locally
+        resolver = None if args.proxy else aiodns.DNSResolver()
+        limiter = AsyncLimiter(1, 1 / args.rate_limit)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_HOSTS)
+        # Each host probes all of its ports at once, so size the pool to avoid PoolTimeout
+        limits = httpx.Limits(max_connections=MAX_CONCURRENT_HOSTS * len(args.ports), max_keepalive_connections=64)
+        async with httpx.AsyncClient(http2=True, timeout=10, limits=limits, proxy=args.proxy, verify=False,
+                                     headers={"User-Agent": args.user_agent}) as client:
+            tasks = [bounded_check_liveliness(semaphore, client, resolver, subdomain, args.ports, limiter)
+                     for subdomain in combined_subdomains]
+
+            # Write one JSON object per line as each host finishes instead of collecting every result first
+            with open('liveliness_check_results.jsonl', 'wb') as f:
+                for task in asyncio.as_completed(tasks):
+                    for result in await task:
+                        # Filter out unreachable hosts unless --debug is specified
+                        if args.debug or 'could not be reached' not in result['status']:
+                            f.write(orjson.dumps(result) + b'\n')
         
-        logging.info("Liveliness check results have been saved to liveliness_check_results.json")
+        logging.info("Liveliness check results have been saved to liveliness_check_results.jsonl")
         
     else:
         logging.warning(f"No subdomains found for {args.domain}.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,22 +1,38 @@
 import argparse
+import mmap
 import os
 from tqdm import tqdm
 
+WRITE_BUFFER_SIZE = 1 << 20  # bytes
+WRITE_CHUNK_WORDS = 65536
+
+def read_words(file_name):
+    if not os.path.isfile(file_name):
+        return None
+    if os.path.getsize(file_name) == 0:
+        return set()  # mmap can't map an empty file
+    # Map the file instead of reading it into one big string, and keep words as bytes
+    with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return {line.rstrip(b'\r\n') for line in iter(mm.readline, b'')}
+
 def combine_wordlists(file_list, output_file):
     combined_words = set()  # Use a set to automatically handle duplicates
 
+    # Files are read one at a time: line splitting holds the GIL, so threads wouldn't overlap the work
+    # and would only keep several per-file sets alive at once
     for file_name in tqdm(file_list, desc="Processing files"):
-        if os.path.isfile(file_name):
-            with open(file_name, 'r') as file:
-                words = file.read().splitlines()  # Read lines and remove newline characters
-                combined_words.update(words)  # Add words to the set
-        else:
+        words = read_words(file_name)
+        if words is None:
             print(f"File not found: {file_name}")
+        else:
+            combined_words.update(words)
 
     # Write the combined words to the output file
-    with open(output_file, 'w') as output:
-        for word in sorted(combined_words):  # Sort the words before writing
-            output.write(word + '\n')
+    sorted_words = sorted(combined_words)  # Sort the words before writing
+    with open(output_file, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+        # Join in fixed-size chunks so there's no per-word concat and no single huge copy
+        for start in range(0, len(sorted_words), WRITE_CHUNK_WORDS):
+            output.write(b'\n'.join(sorted_words[start:start + WRITE_CHUNK_WORDS]) + b'\n')
 
     print(f"Combined wordlist saved to {output_file}")
 